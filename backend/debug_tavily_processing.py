@@ -5,14 +5,10 @@ Debug the Tavily result processing pipeline.
 
 import os
 import sys
-from dotenv import load_dotenv
 
 # Add src to path
 sys.path.append('src')
 
-# Load environment variables
-load_dotenv()
-
 def debug_tavily_processing():
     """Debug the complete Tavily processing pipeline."""
     
@@ -22,12 +18,16 @@ def debug_tavily_processing():
     try:
         # Import our modules
         from langchain_tavily import TavilySearch
+        from agent.configuration import ensure_env
         from agent.tavily_processor import (
             process_search_results_for_ai,
             validate_and_clean_content,
             extract_tavily_results
         )
         
+        # Load environment variables
+        ensure_env()
+        
         # Test query
         test_query = "人工智能 2024"
         print(f"🔍 Testing query: '{test_query}'")
@@ -58,14 +58,14 @@ def debug_tavily_processing():
         if extracted_results:
             first_extracted = extracted_results[0]
             print(f"📄 First extracted result:")
-            print(f"   Title: {first_extracted.get('title', 'No title')}")
-            print(f"   URL: {first_extracted.get('url', 'No URL')}")
-            print(f"   Content length: {len(first_extracted.get('content', ''))}")
+            print(f"   Title: {first_extracted.title or 'No title'}")
+            print(f"   URL: {first_extracted.url or 'No URL'}")
+            print(f"   Content length: {len(first_extracted.content)}")
         
         # Step 3: Validate and clean content
         print(f"\n3️⃣ Validate and Clean Content...")
         if extracted_results:
-            raw_content = extracted_results[0].get('content', '')
+            raw_content = extracted_results[0].content
             cleaned_content = validate_and_clean_content(raw_content)
             
             print(f"📊 Raw content length: {len(raw_content)}")
@@ -1,10 +1,21 @@
 # mypy: disable - error - code = "no-untyped-def,misc"
 import pathlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
 
+from agent.http_clients import aclose_http_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release the shared HTTP clients when the server shuts down."""
+    yield
+    await aclose_http_clients()
+
+
 # Define the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 def create_frontend_router(build_dir="../frontend/dist"):
@@ -1,13 +1,37 @@
+import functools
 import os
-from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Any, Optional
 
 from langchain_core.runnables import RunnableConfig
 
+_ENV_LOADED = False
+
+
+def ensure_env() -> None:
+    """Load the `.env` file into the process environment, once per process."""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        load_dotenv(override=True)
+        _ENV_LOADED = True
+
+
+def require_env(name: str) -> str:
+    """Return a required environment variable, loading `.env` first if needed."""
+    ensure_env()
+    value = os.getenv(name)
+    if value is None:
+        raise ValueError(f"{name} is not set")
+    return value
+
 
 class Configuration(BaseModel):
     """The configuration for the agent."""
 
+    # Instances are cached and shared between nodes, so they must not be mutated
+    model_config = ConfigDict(frozen=True)
+
     query_generator_model: str = Field(
         default="deepseek-chat",
         metadata={
@@ -39,6 +63,41 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    max_concurrent_searches: int = Field(
+        default=5,
+        metadata={
+            "description": "The maximum number of Tavily searches to run concurrently."
+        },
+    )
+
+    search_cache_ttl_seconds: int = Field(
+        default=3600,
+        metadata={
+            "description": "How long Tavily responses are reused for identical queries (0 disables the cache)."
+        },
+    )
+
+    max_reflection_tokens: int = Field(
+        default=8000,
+        metadata={
+            "description": "Approximate token budget for the summaries given to reflection; the most recent summaries are kept."
+        },
+    )
+
+    sufficiency_token_floor: int = Field(
+        default=3000,
+        metadata={
+            "description": "Approximate number of gathered summary tokens above which research is deemed sufficient without asking the LLM."
+        },
+    )
+
+    use_llm_cache: bool = Field(
+        default=False,
+        metadata={
+            "description": "Whether to answer identical LLM prompts from the local SQLite completion cache."
+        },
+    )
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -55,6 +114,19 @@ class Configuration(BaseModel):
         }
 
         # Filter out None values
-        values = {k: v for k, v in raw_values.items() if v is not None}
+        values = tuple((k, v) for k, v in raw_values.items() if v is not None)
+
+        # Every node and routing function resolves the configuration, so reuse
+        # the instance built for the same effective values
+        try:
+            return _cached_configuration(cls, values)
+        except TypeError:  # unhashable configuration value
+            return cls(**dict(values))
+
 
-        return cls(**values)
+@functools.lru_cache(maxsize=64)
+def _cached_configuration(
+    cls: type[Configuration], values: tuple[tuple[str, Any], ...]
+) -> Configuration:
+    """Build a Configuration once per distinct set of values."""
+    return cls(**dict(values))
@@ -1,13 +1,22 @@
+import asyncio
+import functools
+import logging
 import os
+import re
+from typing import Any, Iterable, Optional
+
+import httpx
+import openai
+import orjson
 
 from agent.tools_and_schemas import SearchQueryList, Reflection
-from dotenv import load_dotenv
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langgraph.types import Send
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
+from langgraph.config import get_stream_writer
 from langchain_core.runnables import RunnableConfig
-from langchain_tavily import TavilySearch
+from pydantic import BaseModel
 
 from agent.state import (
     OverallState,
@@ -15,35 +24,167 @@ from agent.state import (
     ReflectionState,
     WebSearchState,
 )
-from agent.configuration import Configuration
+from agent.configuration import Configuration, require_env
+from agent.http_clients import (
+    TAVILY_SEARCH_URL,
+    get_deepseek_client,
+    get_tavily_client,
+    on_http_clients_closed,
+)
+from agent.llm_cache import get_llm_cache, stream_text
+from agent.search_cache import SearchCache, normalize_query
 from agent.prompts import (
     get_current_date,
     query_writer_instructions,
-    web_searcher_instructions,
     reflection_instructions,
     answer_instructions,
+    render_query_prompt,
+    render_reflection_prompt,
+    render_answer_prompt,
 )
 from langchain_openai import ChatOpenAI
 from agent.utils import (
+    CitationRewriter,
     get_research_topic,
 )
 from agent.tavily_processor import (
+    Source,
+    extract_tavily_results,
     process_search_results_for_ai,
-    create_structured_search_prompt,
+    create_structured_search_messages,
     validate_ai_response,
     process_citations_in_response,
 )
 
-load_dotenv(override=True)
+logger = logging.getLogger(__name__)
+
+_DEEPSEEK_KEY = require_env("DEEPSEEK_API_KEY")
+_TAVILY_KEY = require_env("TAVILY_API_KEY")
 
-if os.getenv("DEEPSEEK_API_KEY") is None:
-    raise ValueError("DEEPSEEK_API_KEY is not set")
+# Number of results requested from Tavily per query
+_TAVILY_MAX_RESULTS = 5
+# Tavily responses keyed by normalized query, shared across runs
+_search_cache = SearchCache(maxsize=256)
 
-if os.getenv("TAVILY_API_KEY") is None:
-    raise ValueError("TAVILY_API_KEY is not set")
+# Separator between research summaries in prompts
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+# Rough characters per token, used to budget the reflection prompt
+_CHARS_PER_TOKEN = 4
+# Minimum number of sources for research to be deemed sufficient without reflection
+_MIN_SUFFICIENT_SOURCES = 3
+
+# Verdict keywords in the plain-text reflection fallback
+_SUFFICIENCY_VERDICT_RE = re.compile(
+    r"\b(sufficient|enough|complete|yes|adequate|no|not|insufficient|incomplete)\b",
+    re.IGNORECASE,
+)
+_SUFFICIENT_VERDICTS = frozenset({"sufficient", "enough", "complete", "yes", "adequate"})
 
-# Initialize Tavily Search
-tavily_search = TavilySearch(max_results=5)
+
+# Patterns for the plain-text query parsing fallback
+_COMMENT_LINE_RE = re.compile(r"^\s*(?:#|Search query)")
+# Optional numbering ("1." or "1)") and the quotes DeepSeek sometimes adds
+# incorrectly; lines holding nothing but numbering and quotes are skipped
+_QUERY_LINE_RE = re.compile(
+    r"^\s*(?!\d+[.)][\s\"']*$)(?:\d+[.)]\s*)?[\s\"']*(?P<query>[^\s\"'](?:.*?[^\s\"'])?)[\s\"']*$"
+)
+# Common unwanted suffixes DeepSeek adds; 2024 is only removed if it wasn't in the topic
+_UNWANTED_SUFFIX_RE = re.compile(r"(?:\s+(?:2025|latest|report))+$")
+_UNWANTED_SUFFIX_WITH_2024_RE = re.compile(r"(?:\s+(?:2024|2025|latest|report))+$")
+
+
+def _parse_search_queries(text: str, research_topic: str) -> list[str]:
+    """Parse one search query per line from a plain-text LLM response."""
+    suffix_re = (
+        _UNWANTED_SUFFIX_RE if "2024" in research_topic else _UNWANTED_SUFFIX_WITH_2024_RE
+    )
+    return [
+        query
+        for line in text.splitlines()
+        if not _COMMENT_LINE_RE.match(line)
+        and (match := _QUERY_LINE_RE.match(line))
+        and (query := suffix_re.sub("", match.group("query")))
+    ]
+
+
+# Structured output support per model, recorded after the first attempt so that
+# models without it go straight to the text fallback on later calls
+_STRUCTURED_OK: dict[str, bool] = {}
+_FORCE_TEXT_PARSE = os.getenv("FORCE_TEXT_PARSE") == "1"
+
+# Request rejections (400/422) that are about the structured output parameters
+# themselves, as opposed to e.g. an exceeded context length
+_STRUCTURED_REJECTION_ERRORS = (openai.BadRequestError, openai.UnprocessableEntityError)
+_STRUCTURED_PARAMS_RE = re.compile(r"response_format|tool|function", re.IGNORECASE)
+
+
+def _rejects_structured_output(error: Exception) -> bool:
+    """Return whether `error` means the model doesn't support structured output."""
+    return isinstance(error, _STRUCTURED_REJECTION_ERRORS) and bool(
+        _STRUCTURED_PARAMS_RE.search(str(error))
+    )
+
+
+async def _invoke_structured(
+    llm: ChatOpenAI, model: str, schema: type[BaseModel], prompt: Any
+) -> Optional[BaseModel]:
+    """Invoke the LLM with structured output.
+
+    Support is only recorded as missing when the API rejects the structured
+    output request or the model answers without producing the structure. Other
+    errors, e.g. connection, authentication or one-off parsing failures, fall
+    back to text parsing for this call only.
+
+    Returns:
+        The parsed result, or None if the caller should use its text parsing fallback
+    """
+    if _FORCE_TEXT_PARSE or _STRUCTURED_OK.get(model) is False:
+        return None
+    try:
+        result = await llm.with_structured_output(schema).ainvoke(prompt)
+    except Exception as e:
+        logger.info("Structured output failed, using text parsing fallback: %s", e)
+        if _rejects_structured_output(e):
+            _STRUCTURED_OK[model] = False
+        return None
+    if result is None:
+        logger.info("Structured output not supported, using text parsing fallback")
+        _STRUCTURED_OK[model] = False
+        return None
+    _STRUCTURED_OK[model] = True
+    return result
+
+
+def _get_llm(model: str, temperature: float, max_retries: int, use_cache: bool = False) -> ChatOpenAI:
+    """Return a shared DeepSeek client so its HTTP connection pool is reused across nodes.
+
+    Models are cached per HTTP client, i.e. per event loop, so a model never
+    uses connections of another loop or a client that has been closed. With
+    `use_cache`, identical prompts are answered from the SQLite completion cache.
+    """
+    return _build_llm(model, temperature, max_retries, use_cache, get_deepseek_client())
+
+
+@functools.lru_cache(maxsize=16)
+def _build_llm(
+    model: str,
+    temperature: float,
+    max_retries: int,
+    use_cache: bool,
+    http_client: httpx.AsyncClient,
+) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_retries=max_retries,
+        api_key=_DEEPSEEK_KEY,
+        base_url="https://api.deepseek.com",
+        http_async_client=http_client,
+        cache=get_llm_cache() if use_cache else None,
+    )
+
+
+on_http_clients_closed(_build_llm.cache_clear)
 
 
 # Nodes
@@ -67,35 +208,34 @@ async def generate_query(state: OverallState, config: RunnableConfig) -> QueryGe
         state["initial_search_query_count"] = configurable.number_of_initial_queries
 
     # init DeepSeek via OpenAI API
-    llm = ChatOpenAI(
-        model=configurable.query_generator_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url="https://api.deepseek.com",
-    )
+    llm = _get_llm(configurable.query_generator_model, 1.0, 2, configurable.use_llm_cache)
     # Format the prompt
     current_date = get_current_date()
     research_topic = get_research_topic(state["messages"])
-    print(f"DEBUG: Original user input: {research_topic}")
+    logger.debug("Original user input: %s", research_topic)
     
-    formatted_prompt = query_writer_instructions.format(
-        current_date=current_date,
-        research_topic=research_topic,
-        number_queries=state["initial_search_query_count"],
-    )
+    formatted_prompt = [
+        SystemMessage(content=query_writer_instructions),
+        HumanMessage(
+            content=render_query_prompt(
+                current_date=current_date,
+                research_topic=research_topic,
+                number_queries=state["initial_search_query_count"],
+            )
+        ),
+    ]
     
     # Try structured output first, with DeepSeek compatibility fallback
-    try:
-        structured_llm = llm.with_structured_output(SearchQueryList)
-        result = await structured_llm.ainvoke(formatted_prompt)
+    result = await _invoke_structured(
+        llm, configurable.query_generator_model, SearchQueryList, formatted_prompt
+    )
+    if result is not None:
         search_queries = result.query
-    except Exception as e:
-        print(f"INFO: Structured output not supported, using text parsing fallback: {str(e)}")
+    else:
         # Fallback: Use regular LLM and parse manually
         simple_prompt = f"""Based on the following research topic, generate {state["initial_search_query_count"]} search queries:
 
-Research Topic: {get_research_topic(state["messages"])}
+Research Topic: {research_topic}
 Current Date: {current_date}
 
 Please directly list {state["initial_search_query_count"]} search queries, one per line:"""
@@ -103,151 +243,255 @@ Please directly list {state["initial_search_query_count"]} search queries, one p
         response = await llm.ainvoke(simple_prompt)
         try:
             # Parse search queries from response
-            lines = response.content.strip().split('\n')
-            search_queries = []
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('#') and not line.startswith('Search query'):
-                    # Remove numbering and clean up
-                    clean_line = line.split('.', 1)[-1].strip() if '.' in line else line
-                    # Remove quotes that DeepSeek sometimes adds incorrectly
-                    clean_line = clean_line.strip('"').strip("'").strip()
-                    # Remove common unwanted suffixes DeepSeek adds
-                    unwanted_suffixes = [' 2025', ' latest', ' report']
-                    # Only remove 2024 if it wasn't in the original topic
-                    if clean_line.endswith(' 2024') and '2024' not in research_topic:
-                        clean_line = clean_line[:-5].strip()
-                    
-                    for suffix in unwanted_suffixes:
-                        if clean_line.endswith(suffix):
-                            clean_line = clean_line[:-len(suffix)].strip()
-                    if clean_line:
-                        search_queries.append(clean_line)
+            search_queries = _parse_search_queries(response.content, research_topic)
             
             # Ensure we have at least one query
             if not search_queries:
-                search_queries = [get_research_topic(state["messages"])]
+                search_queries = [research_topic]
             elif len(search_queries) > state["initial_search_query_count"]:
                 search_queries = search_queries[:state["initial_search_query_count"]]
                 
         except Exception:
-            search_queries = [get_research_topic(state["messages"])]
+            search_queries = [research_topic]
     
-    print(f"DEBUG: Generated search queries: {search_queries}")
+    logger.debug("Generated search queries: %s", search_queries)
     return {"search_query": search_queries}
 
 
+def _dedupe_queries(queries: list[str], exclude: Iterable[str] = ()) -> list[str]:
+    """Drop empty queries and queries that normalize to a kept or excluded one."""
+    seen = {normalize_query(query) for query in exclude}
+    unique_queries = []
+    for query in queries:
+        key = normalize_query(query)
+        if key and key not in seen:
+            seen.add(key)
+            unique_queries.append(query)
+    return unique_queries
+
+
 def continue_to_web_research(state: QueryGenerationState):
     """LangGraph node that sends the search queries to the web research node.
 
-    This is used to spawn n number of web research nodes, one for each search query.
+    All unique queries are sent as a single batch so that the searches can run
+    concurrently inside one `batch_web_search` node.
     """
-    return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
-        for idx, search_query in enumerate(state["search_query"])
-    ]
+    return Send(
+        "batch_web_search",
+        {"search_query": _dedupe_queries(state["search_query"]), "id": 0},
+    )
+
+
+async def _tavily_async(search_query: str) -> dict:
+    """Search Tavily's REST API on the shared async HTTP client."""
+    response = await get_tavily_client().post(
+        TAVILY_SEARCH_URL,
+        json={"query": search_query, "max_results": _TAVILY_MAX_RESULTS},
+        headers={"Authorization": f"Bearer {_TAVILY_KEY}"},
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+async def _search_one(
+    search_query: str, semaphore: asyncio.Semaphore, cache_ttl_seconds: float
+) -> dict:
+    """Run a single Tavily search, bounded by the shared semaphore.
+
+    Responses are cached by normalized query, so repeated queries within
+    `cache_ttl_seconds` don't hit Tavily again, and concurrent runs issuing the
+    same query share one request. Responses without results are not cached, so
+    a later research loop can retry the query.
+    """
+
+    async def fetch() -> dict:
+        async with semaphore:
+            logger.debug(
+                "Starting search for query %r (max_results: %s)",
+                search_query,
+                _TAVILY_MAX_RESULTS,
+            )
+            return await _tavily_async(search_query)
+
+    search_results, cache_hit = await _search_cache.get_or_fetch(
+        normalize_query(search_query),
+        cache_ttl_seconds,
+        fetch,
+        cacheable=lambda response: bool(isinstance(response, dict) and response.get("results")),
+    )
+    if cache_hit:
+        logger.debug("Using cached Tavily response for query %r", search_query)
+    return search_results
+
+
+def _get_joined_summaries(state: OverallState, max_tokens: Optional[int] = None) -> str:
+    """Return the research summaries joined with SUMMARY_SEPARATOR.
+
+    Uses the `joined_summaries` text accumulated by batch_web_search, so the
+    growing list of summaries isn't re-joined on every research loop. If
+    `max_tokens` is given, only the most recent summaries fitting the
+    approximate budget are kept.
+    """
+    joined = state.get("joined_summaries")
+    if joined:
+        joined = joined.removeprefix(SUMMARY_SEPARATOR)
+    else:
+        joined = SUMMARY_SEPARATOR.join(state["web_research_result"])
+
+    if max_tokens is None or len(joined) <= max_tokens * _CHARS_PER_TOKEN:
+        return joined
 
+    # Keep the tail, starting at a summary boundary when possible
+    tail = joined[-max_tokens * _CHARS_PER_TOKEN:]
+    boundary = tail.find(SUMMARY_SEPARATOR)
+    return tail[boundary + len(SUMMARY_SEPARATOR):] if boundary != -1 else tail
 
-async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+
+def _search_error_result(search_query: str, error: BaseException) -> dict[str, Any]:
+    """Build the research result reported for a query that raised an error."""
+    logger.error("Error in batch_web_search for query %r: %s", search_query, error)
+    return {
+        "sources_gathered": [],
+        "web_research_result": f"Error occurred during search: {str(error)}. Please try again later.",
+    }
+
+
+def _prepare_search_results(search_query: str, search_results: Any) -> tuple[list[str], list[Source]]:
+    """Process the raw Tavily response of one query into formatted sources and metadata."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Raw Tavily response type: %s, keys: %s",
+            type(search_results),
+            list(search_results.keys()) if isinstance(search_results, dict) else "N/A",
+        )
+
+    if isinstance(search_results, dict):
+        # Materialize the results once; processing below reuses the records
+        records = extract_tavily_results(search_results)
+        logger.debug("Raw Tavily found %d results", len(records))
+        if len(records) == 0 and search_results and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Full response for debugging: %s", search_results)
+    else:
+        logger.warning("Unexpected Tavily response format: %s", search_results)
+        records = []
+
+    # Process search results using the new utility
+    formatted_sources, sources_gathered = process_search_results_for_ai(
+        records,
+        max_results=5,
+        max_content_length=1500,
+        min_content_length=20
+    )
+
+    logger.debug(
+        "After processing: %d formatted sources, %d metadata",
+        len(formatted_sources),
+        len(sources_gathered),
+    )
+    return formatted_sources, sources_gathered
+
+
+async def batch_web_search(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """LangGraph node that performs web research using Tavily Search API.
 
-    Executes a web search using Tavily Search API and then uses DeepSeek to analyze and summarize the results.
+    Runs all Tavily searches of the batch concurrently (bounded by
+    `max_concurrent_searches`) and then uses a single batched DeepSeek call to
+    analyze and summarize the results of each query.
 
     Args:
-        state: Current graph state containing the search query and research loop count
+        state: Current graph state containing the batch of search queries
         config: Configuration for the runnable, including search API settings
 
     Returns:
-        Dictionary with state update, including sources_gathered, research_loop_count, and web_research_results
+        Dictionary with state update, including sources_gathered, search_query, and web_research_results
     """
     # Configure
     configurable = Configuration.from_runnable_config(config)
-    
-    search_query = state["search_query"]
-    
-    try:
-        # Perform search using Tavily
-        print(f"DEBUG: Starting search for query: '{search_query}'")
-        print(f"DEBUG: Tavily config - max_results: {tavily_search.max_results}")
-        print(f"DEBUG: Search query type: {type(search_query)}, length: {len(search_query)}")
-        print(f"DEBUG: Query repr: {repr(search_query)}")
-        
-        # Use asyncio.to_thread to prevent blocking I/O in async environment
-        import asyncio
-        search_results = await asyncio.to_thread(tavily_search.invoke, search_query)
-        print(f"DEBUG: Raw Tavily response type: {type(search_results)}")
-        print(f"DEBUG: Raw Tavily response keys: {list(search_results.keys()) if isinstance(search_results, dict) else 'N/A'}")
-        
-        if isinstance(search_results, dict):
-            raw_results = search_results.get('results', [])
-            print(f"DEBUG: Raw Tavily found {len(raw_results)} results")
-            if len(raw_results) == 0 and search_results:
-                print(f"DEBUG: Full response for debugging: {search_results}")
-        else:
-            print(f"DEBUG: Unexpected Tavily response format: {search_results}")
-            search_results = {"results": []}
-        
-        # Process search results using the new utility
-        formatted_sources, sources_gathered = process_search_results_for_ai(
-            search_results,
-            max_results=5,
-            max_content_length=1500,
-            min_content_length=20
+
+    search_queries = state["search_query"]
+    semaphore = asyncio.Semaphore(configurable.max_concurrent_searches)
+
+    tasks = [
+        asyncio.create_task(
+            _search_one(search_query, semaphore, configurable.search_cache_ttl_seconds)
         )
-        
-        print(f"DEBUG: After processing: {len(formatted_sources)} formatted sources, {len(sources_gathered)} metadata")
-        
+        for search_query in search_queries
+    ]
+    search_results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Results are keyed by the position of the query in the batch
+    results: dict[int, dict[str, Any]] = {}
+    pending: dict[int, list[Source]] = {}
+    prompts = []
+    current_date = get_current_date()
+    for idx, (search_query, raw_results) in enumerate(zip(search_queries, search_results)):
+        if isinstance(raw_results, BaseException):
+            results[idx] = _search_error_result(search_query, raw_results)
+            continue
+        try:
+            formatted_sources, sources_gathered = _prepare_search_results(search_query, raw_results)
+        except Exception as e:
+            results[idx] = _search_error_result(search_query, e)
+            continue
+
         if not formatted_sources:
-            print(f"WARNING: No valid search results found for query: {search_query}")
-            return {
+            logger.warning("No valid search results found for query: %s", search_query)
+            results[idx] = {
                 "sources_gathered": [],
-                "search_query": [search_query],
-                "web_research_result": [f"Could not find relevant information about '{search_query}'. Please try using different keywords."],
+                "web_research_result": f"Could not find relevant information about '{search_query}'. Please try using different keywords.",
             }
-        
+            continue
+
         # Create structured prompt for DeepSeek
-        analysis_prompt = create_structured_search_prompt(
-            search_query=search_query,
-            formatted_sources=formatted_sources,
-            current_date=get_current_date(),
-            instruction_type="analysis"
+        pending[idx] = sources_gathered
+        prompts.append(
+            create_structured_search_messages(
+                search_query=search_query,
+                formatted_sources=formatted_sources,
+                current_date=current_date,
+                instruction_type="analysis"
+            )
         )
-    
-        # Use DeepSeek to analyze and summarize the search results
-        llm = ChatOpenAI(
-            model=configurable.query_generator_model,
-            temperature=0.1,  # Slightly higher for better analysis
-            max_retries=3,
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            base_url="https://api.deepseek.com",
+
+    if prompts:
+        # Use DeepSeek to analyze and summarize the search results of all queries at once
+        llm = _get_llm(configurable.query_generator_model, 0.1, 3, configurable.use_llm_cache)  # Slightly higher temperature for better analysis
+        responses = await llm.abatch(
+            prompts,
+            config={"max_concurrency": configurable.max_concurrent_searches},
+            return_exceptions=True,
         )
-        
-        response = await llm.ainvoke(analysis_prompt)
-        
-        # Validate response quality using utility function
-        if not validate_ai_response(response.content, min_length=100):
-            return {
-                "sources_gathered": sources_gathered,
-                "search_query": [search_query],
-                "web_research_result": [f"Analysis results incomplete. Search for '{search_query}' found {len(sources_gathered)} sources, but analysis encountered issues."],
-            }
-        
-        # Process citations in the response
-        analysis_result = process_citations_in_response(response.content, sources_gathered)
-        
-        return {
-            "sources_gathered": sources_gathered,
-            "search_query": [search_query],
-            "web_research_result": [analysis_result],
-        }
-        
-    except Exception as e:
-        print(f"ERROR in web_research: {str(e)}")
-        return {
-            "sources_gathered": [],
-            "search_query": [search_query],
-            "web_research_result": [f"Error occurred during search: {str(e)}. Please try again later."],
-        }
+
+        for (idx, sources_gathered), response in zip(pending.items(), responses):
+            search_query = search_queries[idx]
+            if isinstance(response, BaseException):
+                results[idx] = _search_error_result(search_query, response)
+            # Validate response quality using utility function
+            elif not validate_ai_response(response.content, min_length=100):
+                results[idx] = {
+                    "sources_gathered": sources_gathered,
+                    "web_research_result": f"Analysis results incomplete. Search for '{search_query}' found {len(sources_gathered)} sources, but analysis encountered issues.",
+                }
+            else:
+                # Process citations in the response
+                results[idx] = {
+                    "sources_gathered": sources_gathered,
+                    "web_research_result": process_citations_in_response(response.content, sources_gathered),
+                }
+
+    analyses = [results[idx] for idx in range(len(search_queries))]
+    web_research_result = [analysis["web_research_result"] for analysis in analyses]
+    return {
+        # Sources enter the graph state in their serializable dictionary form
+        "sources_gathered": [
+            source.to_dict() for analysis in analyses for source in analysis["sources_gathered"]
+        ],
+        "search_query": search_queries,
+        "web_research_result": web_research_result,
+        "joined_summaries": "".join(
+            SUMMARY_SEPARATOR + summary for summary in web_research_result
+        ),
+    }
 
 
 async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
@@ -269,24 +513,49 @@ async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionS
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
     reasoning_model = state.get("reasoning_model", configurable.reflection_model)
 
-    # Format the prompt
-    current_date = get_current_date()
-    formatted_prompt = reflection_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
+    # Skip the LLM call when the outcome is already clear: the loop budget is
+    # exhausted, or enough material from enough sources has been gathered
+    max_research_loops = (
+        state.get("max_research_loops")
+        if state.get("max_research_loops") is not None
+        else configurable.max_research_loops
     )
+    gathered_tokens = sum(len(summary) for summary in state["web_research_result"]) // _CHARS_PER_TOKEN
+    if state["research_loop_count"] >= max_research_loops or (
+        gathered_tokens >= configurable.sufficiency_token_floor
+        and len(state.get("sources_gathered", [])) >= _MIN_SUFFICIENT_SOURCES
+    ):
+        logger.debug(
+            "Research deemed sufficient without reflection (loop %d, ~%d tokens)",
+            state["research_loop_count"],
+            gathered_tokens,
+        )
+        return {
+            "is_sufficient": True,
+            "knowledge_gap": "",
+            "follow_up_queries": [],
+            "research_loop_count": state["research_loop_count"],
+            "number_of_ran_queries": len(state["search_query"]),
+        }
+
+    research_topic = get_research_topic(state["messages"])
+    summaries = _get_joined_summaries(state, configurable.max_reflection_tokens)
+
+    # Format the prompt
+    formatted_prompt = [
+        SystemMessage(content=reflection_instructions),
+        HumanMessage(
+            content=render_reflection_prompt(
+                research_topic=research_topic,
+                summaries=summaries,
+            )
+        ),
+    ]
     # init Reasoning Model
-    llm = ChatOpenAI(
-        model=reasoning_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url="https://api.deepseek.com",
-    )
+    llm = _get_llm(reasoning_model, 1.0, 2, configurable.use_llm_cache)
     # Try structured output first, with DeepSeek compatibility fallback
-    try:
-        result = await llm.with_structured_output(Reflection).ainvoke(formatted_prompt)
+    result = await _invoke_structured(llm, reasoning_model, Reflection, formatted_prompt)
+    if result is not None:
         return {
             "is_sufficient": result.is_sufficient,
             "knowledge_gap": result.knowledge_gap,
@@ -294,37 +563,36 @@ async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionS
             "research_loop_count": state["research_loop_count"],
             "number_of_ran_queries": len(state["search_query"]),
         }
-    except Exception as e:
-        print(f"INFO: Structured reflection not supported, using simplified analysis: {str(e)}")
-        # Simplified reflection without structured output
-        simple_prompt = f"""Analyze the completeness of the following research summaries:
 
-Research Topic: {get_research_topic(state["messages"])}
+    # Simplified reflection without structured output
+    simple_prompt = f"""Analyze the completeness of the following research summaries:
+
+Research Topic: {research_topic}
 Summary Content:
-{chr(10).join(state["web_research_result"][:3])}
+{summaries}
 
 Please answer:
 1. Is this information sufficient to answer the user's question? (Yes/No)
 2. If not, what additional information is needed?"""
-        
-        response = await llm.ainvoke(simple_prompt)
-        
-        # Simple parsing based on keywords
-        content = response.content.lower()
-        is_sufficient = any(word in content for word in ['sufficient', 'enough', 'complete', 'yes', 'adequate'])
-        
-        # For demo purposes, limit research loops to avoid infinite loops
-        max_loops = state.get("max_research_loops", 1)
-        if state["research_loop_count"] >= max_loops:
-            is_sufficient = True
-        
-        return {
-            "is_sufficient": is_sufficient,
-            "knowledge_gap": "Need more detailed information" if not is_sufficient else "",
-            "follow_up_queries": [f"{get_research_topic(state['messages'])} detailed information"] if not is_sufficient else [],
-            "research_loop_count": state["research_loop_count"],
-            "number_of_ran_queries": len(state["search_query"]),
-        }
+    
+    response = await llm.ainvoke(simple_prompt)
+    
+    # Simple parsing based on the first verdict keyword in the answer
+    verdict = _SUFFICIENCY_VERDICT_RE.search(response.content)
+    is_sufficient = verdict is not None and verdict.group(1).lower() in _SUFFICIENT_VERDICTS
+    
+    # For demo purposes, limit research loops to avoid infinite loops
+    max_loops = state.get("max_research_loops", 1)
+    if state["research_loop_count"] >= max_loops:
+        is_sufficient = True
+    
+    return {
+        "is_sufficient": is_sufficient,
+        "knowledge_gap": "Need more detailed information" if not is_sufficient else "",
+        "follow_up_queries": [f"{research_topic} detailed information"] if not is_sufficient else [],
+        "research_loop_count": state["research_loop_count"],
+        "number_of_ran_queries": len(state["search_query"]),
+    }
 
 
 def evaluate_research(
@@ -341,7 +609,7 @@ def evaluate_research(
         config: Configuration for the runnable, including max_research_loops setting
 
     Returns:
-        String literal indicating the next node to visit ("web_research" or "finalize_summary")
+        String literal indicating the next node to visit ("batch_web_search" or "finalize_summary")
     """
     configurable = Configuration.from_runnable_config(config)
     max_research_loops = (
@@ -351,17 +619,20 @@ def evaluate_research(
     )
     if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
         return "finalize_answer"
-    else:
-        return [
-            Send(
-                "web_research",
-                {
-                    "search_query": follow_up_query,
-                    "id": state["number_of_ran_queries"] + int(idx),
-                },
-            )
-            for idx, follow_up_query in enumerate(state["follow_up_queries"])
-        ]
+
+    # Skip follow-ups that repeat each other or a query that already ran
+    follow_up_queries = _dedupe_queries(
+        state["follow_up_queries"], exclude=state.get("search_query", [])
+    )
+    if not follow_up_queries:
+        return "finalize_answer"
+    return Send(
+        "batch_web_search",
+        {
+            "search_query": follow_up_queries,
+            "id": state["number_of_ran_queries"],
+        },
+    )
 
 
 async def finalize_answer(state: OverallState, config: RunnableConfig):
@@ -382,54 +653,53 @@ async def finalize_answer(state: OverallState, config: RunnableConfig):
 
     # Format the prompt
     current_date = get_current_date()
-    formatted_prompt = answer_instructions.format(
-        current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        summaries="\n---\n\n".join(state["web_research_result"]),
-    )
+    research_topic = get_research_topic(state["messages"])
+    formatted_prompt = [
+        SystemMessage(content=answer_instructions),
+        HumanMessage(
+            content=render_answer_prompt(
+                current_date=current_date,
+                research_topic=research_topic,
+                summaries=_get_joined_summaries(state),
+            )
+        ),
+    ]
 
     # init Reasoning Model, default to DeepSeek
-    llm = ChatOpenAI(
-        model=reasoning_model,
-        temperature=0,
-        max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url="https://api.deepseek.com",
-    )
-    result = await llm.ainvoke(formatted_prompt)
+    llm = _get_llm(reasoning_model, 0, 2, configurable.use_llm_cache)
 
-    # Process citations and create proper hyperlinks with references section
-    unique_sources = []
-    citation_map = {}  # Map citation numbers to sources
-    
-    for i, source in enumerate(state["sources_gathered"]):
-        if source["short_url"] in result.content:
-            # Create numbered citation reference
-            citation_num = len(unique_sources) + 1
-            citation_ref = f"[{citation_num}]"
-            
-            # Replace short URL with citation reference
-            result.content = result.content.replace(
-                source["short_url"], citation_ref
-            )
-            
-            unique_sources.append(source)
-            citation_map[citation_num] = source
+    # Stream the answer and process citations as the tokens arrive, numbering
+    # sources by their first appearance in the answer. The rewritten text is
+    # forwarded to clients streaming with stream_mode="custom" as it is produced
+    write_stream = get_stream_writer()
+    citation_rewriter = CitationRewriter(state["sources_gathered"])
+    content_parts = []
+
+    def emit(text: str) -> None:
+        if text:
+            content_parts.append(text)
+            write_stream({"answer": text})
+
+    async for text in stream_text(llm, formatted_prompt, configurable.use_llm_cache):
+        emit(citation_rewriter.feed(text))
+    emit(citation_rewriter.flush())
+    unique_sources = citation_rewriter.cited_sources
 
     # Add references section at the end if we have sources
     if unique_sources:
         references_section = "\n\n## References\n\n"
-        for citation_num, source in citation_map.items():
+        for citation_num, source in enumerate(unique_sources, start=1):
             title = source.get("title", "Untitled")
             url = source.get("url", source.get("value", ""))
             
             # Create markdown hyperlink format
             references_section += f"{citation_num}. [{title}]({url})\n"
         
-        result.content += references_section
+        emit(references_section)
+    content = "".join(content_parts)
 
     return {
-        "messages": [AIMessage(content=result.content)],
+        "messages": [AIMessage(content=content)],
         "sources_gathered": unique_sources,
     }
 
@@ -439,22 +709,22 @@ builder = StateGraph(OverallState, config_schema=Configuration)
 
 # Define the nodes we will cycle between
 builder.add_node("generate_query", generate_query)
-builder.add_node("web_research", web_research)
+builder.add_node("batch_web_search", batch_web_search)
 builder.add_node("reflection", reflection)
 builder.add_node("finalize_answer", finalize_answer)
 
 # Set the entrypoint as `generate_query`
 # This means that this node is the first one called
 builder.add_edge(START, "generate_query")
-# Add conditional edge to continue with search queries in a parallel branch
+# Send the whole batch of search queries to the web research node
 builder.add_conditional_edges(
-    "generate_query", continue_to_web_research, ["web_research"]
+    "generate_query", continue_to_web_research, ["batch_web_search"]
 )
 # Reflect on the web research
-builder.add_edge("web_research", "reflection")
+builder.add_edge("batch_web_search", "reflection")
 # Evaluate the research
 builder.add_conditional_edges(
-    "reflection", evaluate_research, ["web_research", "finalize_answer"]
+    "reflection", evaluate_research, ["batch_web_search", "finalize_answer"]
 )
 # Finalize the answer
 builder.add_edge("finalize_answer", END)
@@ -0,0 +1,71 @@
+"""Shared HTTP clients.
+
+Clients are created lazily on first use and reused for the lifetime of their
+event loop, so their connection pools stay warm across nodes and runs without
+connections ever being shared between loops. Call `aclose_http_clients` on
+application shutdown to release the connections.
+"""
+
+import asyncio
+import weakref
+from typing import Any, Callable, List, MutableMapping
+
+import httpx
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+_ClientsByLoop = MutableMapping[asyncio.AbstractEventLoop, httpx.AsyncClient]
+
+_tavily_clients: _ClientsByLoop = weakref.WeakKeyDictionary()
+_deepseek_clients: _ClientsByLoop = weakref.WeakKeyDictionary()
+_close_callbacks: List[Callable[[], None]] = []
+
+
+def _client_for_running_loop(clients: _ClientsByLoop, **client_kwargs: Any) -> httpx.AsyncClient:
+    """Return the client of the running event loop, creating it if needed."""
+    loop = asyncio.get_running_loop()
+    client = clients.get(loop)
+    if client is None or client.is_closed:
+        client = clients[loop] = httpx.AsyncClient(**client_kwargs)
+    return client
+
+
+def get_tavily_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client used for Tavily requests."""
+    return _client_for_running_loop(
+        _tavily_clients,
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+    )
+
+
+def get_deepseek_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client used by DeepSeek chat models.
+
+    Multiplexes concurrent completions, e.g. from batched calls, over HTTP/2.
+    Models holding the client must be keyed by it, since each event loop gets
+    its own client.
+    """
+    return _client_for_running_loop(
+        _deepseek_clients,
+        http2=True,
+        timeout=httpx.Timeout(60.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    )
+
+
+def on_http_clients_closed(callback: Callable[[], None]) -> None:
+    """Register a callback run by `aclose_http_clients`, e.g. to drop cached models."""
+    _close_callbacks.append(callback)
+
+
+async def aclose_http_clients() -> None:
+    """Close the shared HTTP clients of the running event loop."""
+    loop = asyncio.get_running_loop()
+    for clients in (_tavily_clients, _deepseek_clients):
+        client = clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+    for callback in _close_callbacks:
+        callback()
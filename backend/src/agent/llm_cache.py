@@ -0,0 +1,47 @@
+"""Persistent caching of LLM completions.
+
+Enabled per run with the `use_llm_cache` configuration flag. Identical prompts
+sent to the same model with the same parameters are then answered from a local
+SQLite database instead of DeepSeek, which mostly pays off in development and
+evaluation runs that replay the same prompts. The database path is read from
+the `LLM_CACHE_DB` environment variable.
+
+Streaming calls bypass LangChain's completion cache, so generation that is
+normally streamed goes through `stream_text`, which falls back to a single
+cached call when the cache is enabled.
+"""
+
+import functools
+import os
+from typing import Any, AsyncIterator
+
+from langchain_core.caches import BaseCache
+from langchain_core.language_models import BaseChatModel
+
+from agent.configuration import ensure_env
+
+DEFAULT_LLM_CACHE_DB = ".llm_cache.db"
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_cache() -> BaseCache:
+    """Return the shared SQLite completion cache, creating it on first use."""
+    from langchain_community.cache import SQLiteCache
+
+    ensure_env()
+    return SQLiteCache(database_path=os.getenv("LLM_CACHE_DB", DEFAULT_LLM_CACHE_DB))
+
+
+async def stream_text(llm: BaseChatModel, prompt: Any, use_cache: bool) -> AsyncIterator[str]:
+    """Yield the text of the model's answer to `prompt` as it is generated.
+
+    With `use_cache`, the answer is generated with `ainvoke`, which reads and
+    writes the completion cache, and yielded as one chunk.
+    """
+    if use_cache:
+        response = await llm.ainvoke(prompt)
+        yield response.content
+        return
+
+    async for chunk in llm.astream(prompt):
+        yield chunk.content
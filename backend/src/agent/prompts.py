@@ -6,15 +6,18 @@ def get_current_date():
     return datetime.now().strftime("%B %d, %Y")
 
 
+# Static system instructions come first and dynamic inputs last, so that the
+# instructions form a byte-identical prefix that DeepSeek can serve from its
+# context cache on every call.
 query_writer_instructions = """Your goal is to generate complex and diverse web search queries. These queries are used by an advanced automated web research tool that can analyze complex results, follow links, and synthesize information.
 
 Instructions:
 - Always prioritize using a single search query, only add another query if the original question requires multiple aspects or elements and one query is insufficient.
 - Each query should focus on a specific aspect of the original question.
-- Do not generate more than {number_queries} queries.
+- Do not generate more than the maximum number of queries given by the user.
 - Queries should be diverse, generate more than 1 query if the topic is broad.
 - Do not generate multiple similar queries, 1 is sufficient.
-- Queries should ensure collection of the most recent information. Current date is {current_date}.
+- Queries should ensure collection of the most recent information, relative to the current date given by the user.
 
 Format:
 - Format your response as a JSON object with both exact keys:
@@ -25,11 +28,14 @@ Example:
 
 Topic: Which grew more last year, Apple's stock revenue growth or the number of people buying iPhones
 ```json
-{{
+{
     "rationale": "To accurately answer this comparative growth question, we need specific data points on Apple's stock performance and iPhone sales metrics. These queries target the precise financial information needed: company revenue trends, product-specific unit sales data, and stock price movements over the same fiscal period for direct comparison.",
     "query": ["Apple 2024 fiscal year total revenue growth", "iPhone 2024 fiscal year unit sales growth", "Apple 2024 fiscal year stock price growth"],
-}}
-```
+}
+```"""
+
+query_writer_inputs = """Current date: {current_date}
+Maximum number of queries: {number_queries}
 
 Context: {research_topic}"""
 
@@ -47,7 +53,7 @@ Research Topic:
 {research_topic}
 """
 
-reflection_instructions = """You are a professional research assistant analyzing summaries about "{research_topic}".
+reflection_instructions = """You are a professional research assistant analyzing research summaries about the user's research topic.
 
 Instructions:
 - Identify knowledge gaps or areas that need deeper exploration, and generate follow-up queries (1 or more).
@@ -66,14 +72,16 @@ Output Format:
 
 Example:
 ```json
-{{
+{
     "is_sufficient": true, // or false
     "knowledge_gap": "The summary lacks information on performance metrics and benchmarks", // Empty string if is_sufficient is true
     "follow_up_queries": ["What are typical performance benchmarks and metrics for evaluating [specific technology]?"] // Empty array if is_sufficient is true
-}}
+}
 ```
 
-Carefully reflect on the summaries to identify knowledge gaps and generate follow-up queries. Then generate your output in this JSON format:
+Carefully reflect on the summaries to identify knowledge gaps and generate follow-up queries. Then generate your output in this JSON format."""
+
+reflection_inputs = """Research Topic: {research_topic}
 
 Summaries:
 {summaries}
@@ -82,13 +90,14 @@ Summaries:
 answer_instructions = """Based on the provided research summaries, generate a comprehensive research report for the user.
 
 Instructions:
-- Current date is {current_date}.
 - You need to integrate multiple research summaries into a complete, coherent report
-- Based on user question "{research_topic}", create a structured analysis report
+- Based on the user question, create a structured analysis report
 - Report should include: executive summary, main findings, specific cases, trend analysis
 - Use [1], [2] etc. markers when citing information
 - Ensure logical and well-structured content
-- Write professional research report in English
+- Write professional research report in English"""
+
+answer_inputs = """Current date: {current_date}
 
 User Question: {research_topic}
 
@@ -96,3 +105,26 @@ Research Summaries:
 {summaries}
 
 Please integrate the above summaries and generate a complete research report:"""
+
+
+def render_query_prompt(current_date: str, research_topic: str, number_queries: int) -> str:
+    """Render the dynamic user part of the query writer prompt."""
+    return query_writer_inputs.format(
+        current_date=current_date,
+        research_topic=research_topic,
+        number_queries=number_queries,
+    )
+
+
+def render_reflection_prompt(research_topic: str, summaries: str) -> str:
+    """Render the dynamic user part of the reflection prompt."""
+    return reflection_inputs.format(research_topic=research_topic, summaries=summaries)
+
+
+def render_answer_prompt(current_date: str, research_topic: str, summaries: str) -> str:
+    """Render the dynamic user part of the answer prompt."""
+    return answer_inputs.format(
+        current_date=current_date,
+        research_topic=research_topic,
+        summaries=summaries,
+    )
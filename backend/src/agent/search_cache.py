@@ -0,0 +1,124 @@
+"""In-process caching of web search responses.
+
+Research loops and repeated runs frequently issue the same search queries.
+This module provides a small least-recently-used cache with a time-to-live so
+that duplicate queries are answered without another Tavily round-trip.
+Concurrent misses for the same query share a single in-flight request.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for use as a cache key.
+
+    Args:
+        query: Raw search query
+
+    Returns:
+        Lowercased query with whitespace runs collapsed to single spaces
+    """
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """Least-recently-used cache whose entries expire after a time-to-live.
+
+    Args:
+        maxsize: Maximum number of entries kept before the least recently used
+            one is evicted
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._inflight: "dict[str, asyncio.Future]" = {}
+
+    def get(self, key: str, ttl_seconds: float) -> Optional[Any]:
+        """Return the cached value for `key`, or None if missing or expired.
+
+        Args:
+            key: Normalized cache key
+            ttl_seconds: Maximum age of an entry; values <= 0 disable the cache
+        """
+        if ttl_seconds <= 0:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store `value` under `key`, evicting the least recently used entry if full."""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        ttl_seconds: float,
+        fetch: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[Any, bool]:
+        """Return the cached value for `key`, fetching and storing it on a miss.
+
+        Concurrent callers that miss on the same key await one shared fetch
+        instead of each issuing their own request.
+
+        Args:
+            key: Normalized cache key
+            ttl_seconds: Maximum age of an entry; values <= 0 disable the cache
+            fetch: Coroutine function producing the value on a miss
+            cacheable: Optional predicate deciding whether a fetched value is stored
+
+        Returns:
+            Tuple of (value, served_without_fetch), where the flag is True when
+            the value came from the cache or from another caller's fetch
+        """
+        value = self.get(key, ttl_seconds)
+        if value is not None:
+            return value, True
+        if ttl_seconds <= 0:
+            return await fetch(), False
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight), True
+
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._store_fetched(key, done, cacheable))
+        # Shielded, so cancelling this caller doesn't cancel the fetch that
+        # other callers may be waiting on
+        return await asyncio.shield(task), False
+
+    def _store_fetched(
+        self, key: str, task: asyncio.Future, cacheable: Optional[Callable[[Any], bool]]
+    ) -> None:
+        self._inflight.pop(key, None)
+        # Retrieving the exception also marks it as handled if no caller is left
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        if cacheable is None or cacheable(value):
+            self.set(key, value)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,76 +1,251 @@
-import os
-from typing import TypedDict, Dict, Any
+import asyncio
+import dataclasses
+import functools
+import re
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple
 
-from dotenv import load_dotenv
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage
 from langgraph.graph import StateGraph, END
 from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI
-from langchain_tavily import TavilySearch
 
 from agent.state import OverallState
-from agent.configuration import Configuration
-from agent.prompts import (
-    get_current_date,
-    query_writer_instructions,
-    web_searcher_instructions,
-    answer_instructions,
-)
+from agent.configuration import Configuration, require_env
+from agent.http_clients import get_deepseek_client, on_http_clients_closed
+from agent.llm_cache import get_llm_cache, stream_text
+from agent.search_cache import SearchCache, normalize_query
+from agent.prompts import get_current_date
 from agent.utils import get_research_topic
 from agent.tavily_processor import (
+    Source,
     process_search_results_for_ai,
     create_structured_search_prompt,
     validate_ai_response,
     process_citations_in_response,
 )
 
-load_dotenv(override=True)
+if TYPE_CHECKING:
+    import httpx
+    from langchain_openai import ChatOpenAI
+    from langchain_tavily import TavilySearch
 
-# Check API keys
-if os.getenv("DEEPSEEK_API_KEY") is None:
-    raise ValueError("DEEPSEEK_API_KEY is not set")
 
-if os.getenv("TAVILY_API_KEY") is None:
-    raise ValueError("TAVILY_API_KEY is not set")
+# The clients below are created on first use, so importing the graph doesn't
+# load their provider SDKs or require API keys until a run actually needs them
 
-# Initialize tools
-tavily_search = TavilySearch(max_results=5)
+@functools.lru_cache(maxsize=1)
+def _get_tavily_search() -> "TavilySearch":
+    """Return the Tavily search tool shared by all runs."""
+    from langchain_tavily import TavilySearch
 
+    require_env("TAVILY_API_KEY")
+    return TavilySearch(max_results=5)
 
-async def research_agent(state: OverallState, config: RunnableConfig) -> Dict[str, Any]:
-    """Simplified research agent that combines query generation, search, and answer generation."""
-    
-    configurable = Configuration.from_runnable_config(config)
-    
-    # Get research topic from messages
-    research_topic = get_research_topic(state["messages"])
+
+def _get_llm(use_cache: bool = False) -> "ChatOpenAI":
+    """Return the DeepSeek LLM shared by all runs, so its HTTP connection pool stays warm.
     
-    # Initialize DeepSeek LLM
-    llm = ChatOpenAI(
+    Models are cached per HTTP client, i.e. per event loop. With `use_cache`,
+    identical prompts are answered from the SQLite completion cache.
+    """
+    return _build_llm(use_cache, get_deepseek_client())
+
+
+@functools.lru_cache(maxsize=4)
+def _build_llm(use_cache: bool, http_client: "httpx.AsyncClient") -> "ChatOpenAI":
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
         model="deepseek-chat",
         temperature=0.1,
         max_retries=2,
-        api_key=os.getenv("DEEPSEEK_API_KEY"),
+        api_key=require_env("DEEPSEEK_API_KEY"),
         base_url="https://api.deepseek.com",
+        http_async_client=http_client,
+        cache=get_llm_cache() if use_cache else None,
+    )
+
+
+on_http_clients_closed(_build_llm.cache_clear)
+
+
+# Processed search results keyed by normalized research topic
+_search_cache = SearchCache(maxsize=256)
+
+
+# Citation markers assigned by process_search_results_for_ai
+_CITATION_MARKER_RE = re.compile(r"\[\d+\]")
+
+
+async def _fetch_search_results(topic: str) -> Tuple[List[str], List[Source]]:
+    """Search Tavily for a topic and process the results for the LLM."""
+    # Perform search using Tavily
+    search_response = await _get_tavily_search().ainvoke(topic)
+    
+    # Process search results using the new utility; the cleaning regexes run
+    # in a worker thread so they don't block other runs on the event loop
+    return await asyncio.to_thread(
+        process_search_results_for_ai,
+        search_response,
+        max_results=5,
+        max_content_length=1500,
+        min_content_length=20
     )
+
+
+async def _search_topic(
+    topic: str, cache_ttl_seconds: float
+) -> Tuple[List[str], List[Source], bool]:
+    """Search Tavily for a topic and process the results, using the cache when possible.
+    
+    Concurrent searches for the same topic share one Tavily call, and results
+    without usable sources are not cached.
+    
+    Returns:
+        Tuple of (formatted_sources, sources_gathered, cache_hit), where
+        cache_hit is True when Tavily was not called for this search
+    """
+    (formatted_sources, sources_gathered), cache_hit = await _search_cache.get_or_fetch(
+        normalize_query(topic),
+        cache_ttl_seconds,
+        lambda: _fetch_search_results(topic),
+        cacheable=lambda results: bool(results[0]),
+    )
+    return formatted_sources, sources_gathered, cache_hit
+
+
+def _no_results_message(topic: str) -> str:
+    return f"Could not find relevant information about '{topic}'. Please try using different keywords."
+
+
+def _incomplete_analysis_message(topic: str, sources_gathered: List[Source]) -> str:
+    return f"Analysis results incomplete. Search for '{topic}' found {len(sources_gathered)} sources, but analysis encountered issues."
+
+
+def _research_update(content: str, sources_gathered: List[Source], cache_hit: bool) -> Dict[str, Any]:
+    """Return the state update of research_agent, with sources in their dictionary form."""
+    return {
+        "messages": [AIMessage(content=content)],
+        "sources_gathered": [source.to_dict() for source in sources_gathered],
+        "cache_hit": cache_hit,
+    }
+
+
+def _renumber_citations(
+    text: str, sources_gathered: List[Source], offset: int
+) -> Tuple[str, List[Source]]:
+    """Shift the citation markers of one topic's answer and sources by `offset`.
+    
+    Sources are copied, so cached results keep their original markers.
+    """
+    if not offset or not sources_gathered:
+        return text, sources_gathered
+    
+    renumbered = [
+        dataclasses.replace(source, short_url=f"[{offset + i}]")
+        for i, source in enumerate(sources_gathered, start=1)
+    ]
+    markers = {
+        old.short_url: new.short_url for old, new in zip(sources_gathered, renumbered)
+    }
+    text = _CITATION_MARKER_RE.sub(lambda match: markers.get(match.group(), match.group()), text)
+    return text, renumbered
+
+
+async def _research_sub_queries(
+    topics: List[str], llm: "ChatOpenAI", configurable: Configuration
+) -> Dict[str, Any]:
+    """Research several topics with concurrent searches and one batched LLM call.
+    
+    Each topic is answered in its own section. Sources are numbered across
+    all topics so that every citation marker identifies a single source.
+    """
+    search_results = await asyncio.gather(
+        *(_search_topic(topic, configurable.search_cache_ttl_seconds) for topic in topics),
+        return_exceptions=True,
+    )
+    
+    current_date = get_current_date()
+    sections: List[str] = [""] * len(topics)
+    topic_sources: List[List[Source]] = [[] for _ in topics]
+    pending: Dict[int, List[Source]] = {}
+    prompts = []
+    for idx, (topic, result) in enumerate(zip(topics, search_results)):
+        if isinstance(result, BaseException):
+            sections[idx] = f"Error occurred during search: {str(result)}"
+            continue
+        
+        formatted_sources, sources_gathered, _ = result
+        if not formatted_sources:
+            sections[idx] = _no_results_message(topic)
+            continue
+        
+        pending[idx] = sources_gathered
+        prompts.append(
+            create_structured_search_prompt(
+                search_query=topic,
+                formatted_sources=formatted_sources,
+                current_date=current_date,
+                instruction_type="answer"
+            )
+        )
+    
+    if prompts:
+        responses = await llm.abatch(
+            prompts,
+            config={"max_concurrency": configurable.max_concurrent_searches},
+            return_exceptions=True,
+        )
+        for (idx, sources_gathered), response in zip(pending.items(), responses):
+            if isinstance(response, BaseException):
+                sections[idx] = f"Error occurred during search: {str(response)}"
+            elif not validate_ai_response(response.content, min_length=50):
+                sections[idx] = _incomplete_analysis_message(topics[idx], sources_gathered)
+                topic_sources[idx] = sources_gathered
+            else:
+                sections[idx] = await asyncio.to_thread(
+                    process_citations_in_response, response.content, sources_gathered
+                )
+                topic_sources[idx] = sources_gathered
+    
+    all_sources: List[Source] = []
+    for idx, topic in enumerate(topics):
+        section, sources_gathered = _renumber_citations(sections[idx], topic_sources[idx], len(all_sources))
+        sections[idx] = f"## {topic}\n\n{section}"
+        all_sources.extend(sources_gathered)
+    
+    return _research_update(
+        "\n\n".join(sections),
+        all_sources,
+        all(not isinstance(result, BaseException) and result[2] for result in search_results),
+    )
+
+
+async def research_agent(state: OverallState, config: RunnableConfig) -> Dict[str, Any]:
+    """Simplified research agent that combines query generation, search, and answer generation.
+    
+    When the state carries several `sub_queries`, they are researched together
+    and answered in one batched LLM call instead of the latest user message.
+    """
+    
+    configurable = Configuration.from_runnable_config(config)
+    
+    sub_queries = state.get("sub_queries") or []
+    
+    # Get research topic from messages
+    research_topic = sub_queries[0] if sub_queries else get_research_topic(state["messages"])
     
     try:
-        # Perform search using Tavily
-        search_response = tavily_search.invoke(research_topic)
+        if len(sub_queries) > 1:
+            return await _research_sub_queries(
+                sub_queries, _get_llm(configurable.use_llm_cache), configurable
+            )
         
-        # Process search results using the new utility
-        formatted_sources, sources_gathered = process_search_results_for_ai(
-            search_response,
-            max_results=5,
-            max_content_length=1500,
-            min_content_length=20
+        formatted_sources, sources_gathered, cache_hit = await _search_topic(
+            research_topic, configurable.search_cache_ttl_seconds
         )
         
         if not formatted_sources:
-            return {
-                "messages": [AIMessage(content=f"Could not find relevant information about '{research_topic}'. Please try using different keywords.")],
-                "sources_gathered": [],
-            }
+            return _research_update(_no_results_message(research_topic), [], cache_hit)
         
         # Create structured prompt using utility function
         formatted_prompt = create_structured_search_prompt(
@@ -80,29 +255,30 @@ async def research_agent(state: OverallState, config: RunnableConfig) -> Dict[st
             instruction_type="answer"
         )
         
-        response = await llm.ainvoke(formatted_prompt)
+        # Stream the answer so token-level graph streaming can forward it as
+        # it is generated; post-processing runs on the complete text
+        content_parts = []
+        llm = _get_llm(configurable.use_llm_cache)
+        async for text in stream_text(llm, formatted_prompt, configurable.use_llm_cache):
+            content_parts.append(text)
+        response_content = "".join(content_parts)
         
         # Validate response quality using utility function
-        if not validate_ai_response(response.content, min_length=50):
-            return {
-                "messages": [AIMessage(content=f"Analysis results incomplete. Search for '{research_topic}' found {len(sources_gathered)} sources, but analysis encountered issues.")],
-                "sources_gathered": sources_gathered,
-            }
+        if not validate_ai_response(response_content, min_length=50):
+            return _research_update(
+                _incomplete_analysis_message(research_topic, sources_gathered), sources_gathered, cache_hit
+            )
         
-        # Process citations in the response
-        analysis_result = process_citations_in_response(response.content, sources_gathered)
+        # Process citations in the response, off the event loop
+        analysis_result = await asyncio.to_thread(
+            process_citations_in_response, response_content, sources_gathered
+        )
         
-        return {
-            "messages": [AIMessage(content=analysis_result)],
-            "sources_gathered": sources_gathered,
-        }
+        return _research_update(analysis_result, sources_gathered, cache_hit)
         
     except Exception as e:
         error_message = f"Error occurred during search: {str(e)}"
-        return {
-            "messages": [AIMessage(content=error_message)],
-            "sources_gathered": [],
-        }
+        return _research_update(error_message, [], False)
 
 
 # Create simplified graph
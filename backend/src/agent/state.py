@@ -14,11 +14,17 @@ class OverallState(TypedDict):
     messages: Annotated[list, add_messages]
     search_query: Annotated[list, operator.add]
     web_research_result: Annotated[list, operator.add]
+    # web_research_result pre-joined with SUMMARY_SEPARATOR, one separator before each summary
+    joined_summaries: Annotated[str, operator.add]
     sources_gathered: Annotated[list, operator.add]
     initial_search_query_count: int
     max_research_loops: int
     research_loop_count: int
     reasoning_model: str
+    # Optional topics that the simple graph researches together in one batch
+    sub_queries: list[str]
+    # Whether the simple graph answered from cached search results, without calling Tavily
+    cache_hit: bool
 
 
 class ReflectionState(TypedDict):
@@ -39,8 +45,8 @@ class QueryGenerationState(TypedDict):
 
 
 class WebSearchState(TypedDict):
-    search_query: str
-    id: str
+    search_query: list[str]
+    id: int
 
 
 @dataclass(kw_only=True)
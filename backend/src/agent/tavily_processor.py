@@ -4,11 +4,59 @@ This module provides utilities for processing and formatting Tavily search resul
 to ensure optimal consumption by AI models, particularly DeepSeek.
 """
 
-from typing import List, Dict, Any, Optional
-import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+import orjson
 import re
 
 
+# Invisible characters that web pages leak into extracted text (zero-width
+# space, word joiner, BOM, soft hyphen); removed in a single translate. The
+# zero-width (non-)joiners are kept: they are part of the spelling of e.g.
+# Persian and Indic text and of emoji sequences
+_INVISIBLE_CHARS_TRANS = str.maketrans(
+    dict.fromkeys(["\u200b", "\u2060", "\ufeff", "\u00ad"])
+)
+# Raw text scanned by cleaning, as a multiple of the truncation length
+_CLEAN_WINDOW_FACTOR = 4
+# Matches cut off by the end of the window can only change this many trailing
+# cleaned characters (longer than the longest noise phrase)
+_CLEAN_WINDOW_MARGIN = 32
+# Bound format method of the per-source block shown to the model
+_format_source = (
+    "=== Source {index} ===\n"
+    "Title: {title}\n"
+    "URL: {url}\n"
+    "Content: {content}\n"
+    "=================="
+).format
+# Boilerplate sentences (cookie banners, ads, script warnings) fused into one
+# alternation so each content string is scanned once. Each match runs to the
+# end of its sentence with a greedy [^.]* rather than a lazy .*? plus
+# lookahead, which keeps the scan linear. Content is whitespace-collapsed
+# before this runs, so the two forms match the same text
+_NOISE_RE = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in [
+        r'\b(Cookie|Privacy Policy|Terms of Service)\b[^.]*',
+        r'\b(Advertisement|Ad)\b[^.]*',
+        r'JavaScript[^.]*',
+        r'Enable JavaScript[^.]*',
+        r'This website uses cookies[^.]*',
+    ]),
+    re.IGNORECASE,
+)
+# Responses that open with or report a failure instead of an answer
+_ERROR_RE = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in [
+        r"^(Error|Sorry|Cannot|Unable)",
+        r"API.*?(error|failed)",
+        r"^(Search.*?failed)",
+    ]),
+    re.IGNORECASE,
+)
+
+
 def validate_and_clean_content(content: str) -> str:
     """Clean and validate content from search results.
     
@@ -21,32 +69,99 @@ def validate_and_clean_content(content: str) -> str:
     if not content or not isinstance(content, str):
         return ""
     
-    # Remove excessive whitespace and normalize
-    content = re.sub(r'\s+', ' ', content.strip())
+    # Drop invisible characters, then collapse all whitespace (including
+    # non-breaking spaces) and strip the ends with C-level split/join
+    content = ' '.join(content.translate(_INVISIBLE_CHARS_TRANS).split())
     
     # Remove common noise patterns
-    noise_patterns = [
-        r'\b(Cookie|Privacy Policy|Terms of Service)\b.*?(?=\.|$)',
-        r'\b(Advertisement|Ad)\b.*?(?=\.|$)',
-        r'JavaScript.*?(?=\.|$)',
-        r'Enable JavaScript.*?(?=\.|$)',
-        r'This website uses cookies.*?(?=\.|$)',
-    ]
-    
-    for pattern in noise_patterns:
-        content = re.sub(pattern, '', content, flags=re.IGNORECASE)
+    content = _NOISE_RE.sub('', content)
     
     return content.strip()
 
 
-def extract_tavily_results(search_response: Any) -> List[Dict[str, Any]]:
+@dataclass(slots=True, frozen=True)
+class Source:
+    """A single search result normalized from a Tavily response.
+    
+    Results selected for the model by `process_search_results_for_ai` also
+    carry their citation marker, plus the domain and URL variants matched by
+    `process_citations_in_response`, computed once when the source is created.
+    """
+
+    title: str
+    url: str
+    content: str
+    short_url: str = ''
+    domain: str = ''
+    url_patterns: tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, result: Dict[str, Any]) -> "Source":
+        """Create a source from a raw result dictionary."""
+        return cls(
+            title=(result.get('title') or '').strip(),
+            url=(result.get('url') or '').strip(),
+            content=(result.get('content') or '').strip(),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the dictionary form stored in graph state and sent to the frontend."""
+        return {
+            "title": self.title,
+            "url": self.url,
+            "content": self.content,
+            "short_url": self.short_url,
+            "value": self.url,
+            "label": self.title,
+        }
+
+
+def _url_domain(url: str) -> str:
+    """Return the network location of a URL, or an empty string if it has none."""
+    try:
+        return urlsplit(url).netloc
+    except ValueError:
+        return ''
+
+
+def _url_patterns(url: str, domain: str) -> tuple[str, ...]:
+    """Return the URL followed by the scheme variants and bare form of its domain."""
+    if not url:
+        return ()
+    if not domain:
+        return (url,)
+    return (url, f"https://{domain}", f"http://{domain}", domain)
+
+
+def _clean_for_truncation(content: str, max_length: int) -> str:
+    """Clean content that will be truncated to `max_length`, scanning as little raw text as possible.
+    
+    Only a window of the raw text is cleaned first. Its result is used when it
+    extends past `max_length` by more than `_CLEAN_WINDOW_MARGIN`, which makes
+    its first `max_length` characters identical to those of the fully cleaned
+    text; otherwise, e.g. for pages that are mostly noise, the full text is
+    cleaned.
+    """
+    window = max_length * _CLEAN_WINDOW_FACTOR
+    if len(content) > window:
+        clean_window = validate_and_clean_content(content[:window])
+        if len(clean_window) > max_length + _CLEAN_WINDOW_MARGIN:
+            return clean_window
+    return validate_and_clean_content(content)
+
+
+def extract_tavily_results(search_response: Any) -> List[Source]:
     """Extract results from various Tavily response formats.
     
+    The response is walked once and materialized into typed records, so later
+    stages use attribute access instead of repeated dictionary lookups.
+    
     Args:
-        search_response: Response from Tavily search API
+        search_response: Response from Tavily search API, or a list of
+            already extracted sources
         
     Returns:
-        List of normalized search result dictionaries
+        List of normalized search results
     """
     results_to_process = []
     
@@ -66,7 +181,7 @@ def extract_tavily_results(search_response: Any) -> List[Dict[str, Any]]:
     elif isinstance(search_response, str):
         # Try to parse JSON string
         try:
-            parsed = json.loads(search_response)
+            parsed = orjson.loads(search_response)
             if isinstance(parsed, dict) and 'results' in parsed:
                 results_to_process = parsed['results']
             else:
@@ -75,14 +190,21 @@ def extract_tavily_results(search_response: Any) -> List[Dict[str, Any]]:
                     'url': '',
                     'content': search_response
                 }]
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             results_to_process = [{
                 'title': 'Search Result',
                 'url': '',
                 'content': search_response
             }]
     
-    return results_to_process
+    records = []
+    for result in results_to_process:
+        if isinstance(result, Source):
+            records.append(result)
+        elif isinstance(result, dict):
+            records.append(Source.from_dict(result))
+    
+    return records
 
 
 def process_search_results_for_ai(
@@ -90,11 +212,12 @@ def process_search_results_for_ai(
     max_results: int = 5,
     max_content_length: int = 1500,
     min_content_length: int = 20
-) -> tuple[List[str], List[Dict[str, Any]]]:
+) -> tuple[List[str], List[Source]]:
     """Process Tavily search results for optimal AI model consumption.
     
     Args:
-        search_response: Raw response from Tavily API
+        search_response: Raw response from Tavily API, or sources returned by
+            `extract_tavily_results`
         max_results: Maximum number of results to process
         max_content_length: Maximum length for individual content pieces
         min_content_length: Minimum length for content to be included
@@ -109,20 +232,16 @@ def process_search_results_for_ai(
     
     valid_result_count = 0
     
-    for i, result in enumerate(raw_results):
+    for record in raw_results:
         if valid_result_count >= max_results:
             break
             
-        if not isinstance(result, dict):
-            continue
-            
         # Extract and validate basic fields
-        title = result.get('title', f'Search Result {valid_result_count + 1}').strip()
-        url = result.get('url', '').strip()
-        raw_content = result.get('content', '').strip()
+        title = record.title or f'Search Result {valid_result_count + 1}'
+        url = record.url
         
         # Clean and validate content
-        clean_content = validate_and_clean_content(raw_content)
+        clean_content = _clean_for_truncation(record.content, max_content_length)
         
         # Skip if content is too short or empty
         if len(clean_content) < min_content_length:
@@ -136,106 +255,167 @@ def process_search_results_for_ai(
         source_id = f"[{valid_result_count}]"
         
         # Format source for AI model consumption with clear structure
-        formatted_source = f"""=== Source {valid_result_count} ===
-Title: {title}
-URL: {url}
-Content: {clean_content}
-=================="""
-        
-        formatted_sources.append(formatted_source)
+        formatted_sources.append(
+            _format_source(index=valid_result_count, title=title, url=url, content=clean_content)
+        )
         
         # Store metadata for citation processing
-        sources_gathered.append({
-            "title": title,
-            "url": url,
-            "content": clean_content,
-            "short_url": source_id,
-            "value": url,
-            "label": title
-        })
+        domain = _url_domain(url)
+        sources_gathered.append(Source(
+            title=title,
+            url=url,
+            content=clean_content,
+            short_url=source_id,
+            domain=domain,
+            url_patterns=_url_patterns(url, domain),
+        ))
     
     return formatted_sources, sources_gathered
 
 
-def create_structured_search_prompt(
-    search_query: str,
-    formatted_sources: List[str],
-    current_date: str,
-    instruction_type: str = "analysis"
-) -> str:
-    """Create a structured prompt for AI model to process search results.
-    
-    Args:
-        search_query: The original search query
-        formatted_sources: List of formatted source content
-        current_date: Current date string
-        instruction_type: Type of instruction ("analysis", "answer", "summary")
-        
-    Returns:
-        Formatted prompt string optimized for DeepSeek processing
-    """
-    
-    if instruction_type == "answer":
-        prompt_template = """You are a professional research analyst. Please carefully analyze the following search results and answer the user's question.
-
-User Question: {search_query}
-Current Date: {current_date}
+# System and user prompt templates per instruction type. The system part holds
+# only static instructions so that it is byte-identical across queries and can
+# be served from DeepSeek's prefix cache; everything that varies per call lives
+# in the user template
+_SEARCH_PROMPT_TEMPLATES: Dict[str, tuple[str, str]] = {
+    "answer": (
+        """You are a professional research analyst. Please carefully analyze the search results provided below and answer the user's question.
 
 Please process the search results according to the following requirements:
 1. Carefully read the content of each source
 2. Extract key information and data
 3. Synthesize and analyze information from multiple sources
 4. Write detailed and accurate answers in English
-5. Use [1], [2] etc. markers to cite sources when referencing information
+5. Use [1], [2] etc. markers to cite sources when referencing information""",
+        """User Question: {search_query}
+Current Date: {current_date}
 
 Search Results:
 {sources}
 
-Please provide a detailed answer:"""
-    
-    elif instruction_type == "summary":
-        prompt_template = """You are a professional information summary expert. Please carefully analyze the following search results and provide a comprehensive summary about "{search_query}".
-
-Current Date: {current_date}
-Research Topic: {search_query}
+Please provide a detailed answer:""",
+    ),
+    "summary": (
+        """You are a professional information summary expert. Please carefully analyze the search results provided below and provide a comprehensive summary about the research topic.
 
 Please process the search results according to the following requirements:
 1. Carefully read the content of each source
 2. Identify key themes and important information
 3. Synthesize viewpoints from multiple sources
 4. Write structured summary reports in English
-5. Use [1], [2] etc. markers to cite sources when referencing information
+5. Use [1], [2] etc. markers to cite sources when referencing information""",
+        """Current Date: {current_date}
+Research Topic: {search_query}
 
 Search Results:
 {sources}
 
-Please provide a comprehensive summary:"""
-    
-    else:  # analysis
-        prompt_template = """You are a professional research analyst. Please carefully analyze the following search results and provide a research summary about "{search_query}".
+Please provide a comprehensive summary:""",
+    ),
+    "analysis": (
+        """You are a professional research analyst. Please carefully analyze the search results provided below and provide a research summary about the research query.
 
 Important Note: This is one step in a multi-step research process. You only need to provide a key information summary for this specific query, not a complete standalone report. The final report will be integrated by subsequent steps that combine all research results.
 
-Current Date: {current_date}
-Research Query: {search_query}
-
 Please process the search results according to the following requirements:
 1. Carefully read the content of each source
 2. Extract key information and data relevant to the query
 3. Organize into a concise information summary (300-500 words)
 4. Focus on facts, data, and specific cases
-5. Use [1], [2] etc. markers to cite sources when referencing information
+5. Use [1], [2] etc. markers to cite sources when referencing information""",
+        """Current Date: {current_date}
+Research Query: {search_query}
 
 Search Results:
 {sources}
 
-Please provide a concise research summary (do not write executive summary, titles, or complete report format):"""
+Please provide a concise research summary (do not write executive summary, titles, or complete report format):""",
+    ),
+}
+
+
+@dataclass(slots=True, frozen=True)
+class _SearchPromptTemplate:
+    """A search prompt template with its user template pre-split around the sources."""
+
+    system_prompt: str
+    format_header: Callable[..., str]
+    footer: str
+
+    @classmethod
+    def from_templates(cls, system_prompt: str, user_template: str) -> "_SearchPromptTemplate":
+        """Create a template from a system prompt and a user template containing `{sources}`."""
+        header, footer = user_template.split("{sources}")
+        return cls(system_prompt=system_prompt, format_header=header.format, footer=footer)
+
+
+# Templates prepared once, so each call is a dict lookup plus one format
+_SEARCH_PROMPTS: Dict[str, _SearchPromptTemplate] = {
+    instruction_type: _SearchPromptTemplate.from_templates(system_prompt, user_template)
+    for instruction_type, (system_prompt, user_template) in _SEARCH_PROMPT_TEMPLATES.items()
+}
+
+
+def create_structured_search_messages(
+    search_query: str,
+    formatted_sources: List[str],
+    current_date: str,
+    instruction_type: str = "analysis"
+) -> List[Dict[str, str]]:
+    """Create structured chat messages for AI model to process search results.
+    
+    Args:
+        search_query: The original search query
+        formatted_sources: List of formatted source content
+        current_date: Current date string
+        instruction_type: Type of instruction ("analysis", "answer", "summary")
+        
+    Returns:
+        List of role/content messages: a static system message followed by
+        a user message with the query-specific content
+    """
+    template = _SEARCH_PROMPTS.get(instruction_type, _SEARCH_PROMPTS["analysis"])
+    
+    # Assemble the user message with a single join instead of formatting the
+    # joined sources into the template
+    parts = [template.format_header(search_query=search_query, current_date=current_date)]
+    for i, formatted_source in enumerate(formatted_sources):
+        if i:
+            parts.append("\n")
+        parts.append(formatted_source)
+    parts.append(template.footer)
+    
+    return [
+        {"role": "system", "content": template.system_prompt},
+        {"role": "user", "content": "".join(parts)},
+    ]
+
+
+def create_structured_search_prompt(
+    search_query: str,
+    formatted_sources: List[str],
+    current_date: str,
+    instruction_type: str = "analysis"
+) -> str:
+    """Create a structured prompt for AI model to process search results.
     
-    return prompt_template.format(
+    Args:
+        search_query: The original search query
+        formatted_sources: List of formatted source content
+        current_date: Current date string
+        instruction_type: Type of instruction ("analysis", "answer", "summary")
+        
+    Returns:
+        Formatted prompt string optimized for DeepSeek processing
+    """
+    messages = create_structured_search_messages(
         search_query=search_query,
+        formatted_sources=formatted_sources,
         current_date=current_date,
-        sources="\n".join(formatted_sources)
+        instruction_type=instruction_type
     )
+    
+    return "\n\n".join(message["content"] for message in messages)
 
 
 def validate_ai_response(response_content: str, min_length: int = 100) -> bool:
@@ -258,81 +438,91 @@ def validate_ai_response(response_content: str, min_length: int = 100) -> bool:
         return False
         
     # Check for common error patterns
-    error_patterns = [
-        r"^(Error|Sorry|Cannot|Unable)",
-        r"API.*?(error|failed)",
-        r"^(Search.*?failed)",
-    ]
+    return _ERROR_RE.search(clean_content) is None
+
+
+def _url_citation_replacements(sources_metadata: List[Source]) -> Dict[str, str]:
+    """Map each source URL and its domain variants to the source's citation marker.
     
-    for pattern in error_patterns:
-        if re.search(pattern, clean_content, re.IGNORECASE):
-            return False
+    When several sources share a URL or domain, the first source wins.
+    """
+    replacements: Dict[str, str] = {}
+    for source in sources_metadata:
+        for pattern in source.url_patterns:
+            replacements.setdefault(pattern, source.short_url)
+    return replacements
+
+
+def _mentions_source_url(text: str, sources_metadata: List[Source]) -> bool:
+    """Return whether any source URL or domain occurs in the text.
     
-    return True
+    Every URL variant rewritten by `process_citations_in_response` contains the
+    source's domain, or is the bare URL when it has none, so one substring
+    check per source decides whether the rewrite can change anything.
+    """
+    return any(
+        source.url and (source.domain or source.url) in text for source in sources_metadata
+    )
 
 
 def process_citations_in_response(
     response_content: str, 
-    sources_metadata: List[Dict[str, Any]]
+    sources_metadata: List[Source]
 ) -> str:
     """Process and normalize citations in AI response.
     
     Args:
         response_content: Raw response from AI model
-        sources_metadata: List of source metadata dictionaries
+        sources_metadata: Sources returned by `process_search_results_for_ai`
         
     Returns:
         Response with properly formatted citations
     """
+    if not response_content or not sources_metadata:
+        return response_content
+    
     processed_content = response_content
     
-    # Replace any direct URL references with citation markers
-    for i, source in enumerate(sources_metadata):
-        url = source.get('url', '')
-        short_url = source.get('short_url', f'[{i+1}]')
-        
-        if url and short_url:
-            # Replace full URL with citation marker
-            processed_content = processed_content.replace(url, short_url)
-            
-            # Also try to replace domain references
-            try:
-                domain = url.split('/')[2]
-                if domain in processed_content and len(domain) > 10:  # Only replace meaningful domains
-                    processed_content = processed_content.replace(domain, short_url)
-                    
-                # Replace common URL patterns
-                url_patterns = [
-                    f"https://{domain}",
-                    f"http://{domain}",
-                    domain
-                ]
-                for pattern in url_patterns:
-                    if pattern in processed_content:
-                        processed_content = processed_content.replace(pattern, short_url)
-                        
-            except (IndexError, AttributeError):
-                pass
-                
-        # Also look for title references that could be cited
-        title = source.get('title', '')
+    # Replace direct URL and domain references with citation markers. Models
+    # usually cite with [n] markers only, so the pattern is only built when a
+    # source URL or domain actually appears
+    if _mentions_source_url(processed_content, sources_metadata):
+        replacements = _url_citation_replacements(sources_metadata)
+        # Longest first, so that a domain never shadows the full URL containing it
+        url_pattern = re.compile(
+            '|'.join(re.escape(text) for text in sorted(replacements, key=len, reverse=True))
+        )
+        processed_content = url_pattern.sub(
+            lambda match: replacements[match.group()], processed_content
+        )
+    
+    # Also look for title references that could be cited. Titles are matched
+    # against one lowercased copy of the text and the citations collected, then
+    # inserted together in a single pass
+    content_lower = processed_content.lower()
+    insertions = []
+    for source in sources_metadata:
+        short_url = source.short_url
+        title = source.title
         if title and len(title) > 20:  # Only meaningful titles
             # If title appears in text but no citation nearby, add citation
-            title_lower = title.lower()
-            content_lower = processed_content.lower()
-            if title_lower in content_lower:
-                # Find the position and add citation if not already present
-                title_pos = content_lower.find(title_lower)
-                if title_pos != -1:
-                    # Check if citation is already nearby (within 50 characters)
-                    nearby_text = processed_content[max(0, title_pos-25):title_pos+len(title)+25]
-                    if short_url not in nearby_text:
-                        # Insert citation after the title
-                        title_end = title_pos + len(title)
-                        processed_content = (
-                            processed_content[:title_end] + 
-                            short_url + 
-                            processed_content[title_end:]
-                        )
+            title_pos = content_lower.find(title.lower())
+            if title_pos != -1:
+                # Check if citation is already nearby (within 50 characters)
+                nearby_text = processed_content[max(0, title_pos-25):title_pos+len(title)+25]
+                if short_url not in nearby_text:
+                    # Insert citation after the title
+                    insertions.append((title_pos + len(title), short_url))
+    
+    if insertions:
+        insertions.sort(key=lambda insertion: insertion[0])
+        parts = []
+        pos = 0
+        for title_end, short_url in insertions:
+            parts.append(processed_content[pos:title_end])
+            parts.append(short_url)
+            pos = title_end
+        parts.append(processed_content[pos:])
+        processed_content = ''.join(parts)
     
     return processed_content
\ No newline at end of file
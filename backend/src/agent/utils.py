@@ -1,3 +1,4 @@
+import re
 from typing import Any, Dict, List
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
 
@@ -19,6 +20,80 @@ def get_research_topic(messages: List[AnyMessage]) -> str:
     return research_topic
 
 
+class CitationRewriter:
+    """
+    Replace the short urls of the given sources with numbered citation markers.
+
+    All short urls are matched by a single compiled alternation, so the text is
+    scanned once regardless of the number of sources. Citation numbers are
+    assigned in order of first appearance in the text; when several sources
+    share a short url, the first one wins.
+
+    Text can be fed incrementally, e.g. while an LLM response is streamed. The
+    last few characters are held back until enough text has arrived to tell
+    whether they start a short url, so urls split across chunks are still
+    rewritten.
+
+    Args:
+        sources (list): Source dictionaries with at least a 'short_url' key.
+    """
+
+    def __init__(self, sources: List[Dict[str, Any]]):
+        self._sources_by_short_url: Dict[str, Dict[str, Any]] = {}
+        for source in sources:
+            if source.get("short_url"):
+                self._sources_by_short_url.setdefault(source["short_url"], source)
+
+        # Longest first, so that a short url never shadows a longer one sharing its prefix
+        short_urls = sorted(self._sources_by_short_url, key=len, reverse=True)
+        self._pattern = (
+            re.compile("|".join(re.escape(short_url) for short_url in short_urls))
+            if short_urls
+            else None
+        )
+        self._max_length = len(short_urls[0]) if short_urls else 0
+        self._buffer = ""
+        self._citation_refs: Dict[str, str] = {}
+        self.cited_sources: List[Dict[str, Any]] = []
+
+    def feed(self, text: str) -> str:
+        """Add text and return the rewritten part that is safe to emit."""
+        self._buffer += text
+        return self._rewrite(final=False)
+
+    def flush(self) -> str:
+        """Return the rewritten remainder of the text fed so far."""
+        return self._rewrite(final=True)
+
+    def _rewrite(self, final: bool) -> str:
+        buffer = self._buffer
+        if self._pattern is None:
+            self._buffer = ""
+            return buffer
+
+        # A short url starting at or after safe_end may not have fully arrived yet
+        safe_end = len(buffer) if final else len(buffer) - self._max_length + 1
+        parts = []
+        pos = 0
+        for match in self._pattern.finditer(buffer):
+            if match.start() >= safe_end:
+                break
+            parts.append(buffer[pos:match.start()])
+            parts.append(self._citation_ref(match.group()))
+            pos = match.end()
+
+        emit_end = max(pos, safe_end)
+        parts.append(buffer[pos:emit_end])
+        self._buffer = buffer[emit_end:]
+        return "".join(parts)
+
+    def _citation_ref(self, short_url: str) -> str:
+        if short_url not in self._citation_refs:
+            self.cited_sources.append(self._sources_by_short_url[short_url])
+            self._citation_refs[short_url] = f"[{len(self.cited_sources)}]"
+        return self._citation_refs[short_url]
+
+
 def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     """
     Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
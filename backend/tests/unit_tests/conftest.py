@@ -0,0 +1,5 @@
+import os
+
+# The graph modules read their API keys at import time; tests never call the APIs
+os.environ.setdefault("DEEPSEEK_API_KEY", "test-deepseek-key")
+os.environ.setdefault("TAVILY_API_KEY", "test-tavily-key")
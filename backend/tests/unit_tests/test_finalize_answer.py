@@ -0,0 +1,45 @@
+import asyncio
+import importlib
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END, START, StateGraph
+
+from agent.state import OverallState
+
+# `agent.graph` is shadowed by the `graph` object exported from the package
+agent_graph = importlib.import_module("agent.graph")
+
+
+def test_finalize_answer_streams_rewritten_answer(monkeypatch):
+    llm = FakeListChatModel(responses=["Fact one [s2]. Fact two [s1] and [s2]."])
+    monkeypatch.setattr(agent_graph, "_get_llm", lambda *args: llm)
+
+    builder = StateGraph(OverallState)
+    builder.add_node("finalize_answer", agent_graph.finalize_answer)
+    builder.add_edge(START, "finalize_answer")
+    builder.add_edge("finalize_answer", END)
+    sources = [
+        {"short_url": "[s1]", "title": "First", "url": "https://a.example"},
+        {"short_url": "[s2]", "title": "Second", "url": "https://b.example"},
+    ]
+
+    async def run():
+        chunks, final = [], None
+        async for mode, payload in builder.compile().astream(
+            {"messages": [HumanMessage(content="question")], "sources_gathered": sources},
+            stream_mode=["custom", "values"],
+        ):
+            if mode == "custom":
+                chunks.append(payload["answer"])
+            else:
+                final = payload
+        return chunks, final
+
+    chunks, final = asyncio.run(run())
+
+    content = final["messages"][-1].content
+    assert "".join(chunks) == content
+    assert content.startswith("Fact one [1]. Fact two [2] and [1].")
+    assert "1. [Second](https://b.example)" in content
+    assert "2. [First](https://a.example)" in content
@@ -0,0 +1,27 @@
+import asyncio
+
+from agent import http_clients
+from agent.graph import _get_llm
+
+
+async def _clients_and_llms():
+    first = (http_clients.get_deepseek_client(), _get_llm("deepseek-chat", 0, 2))
+    second = (http_clients.get_deepseek_client(), _get_llm("deepseek-chat", 0, 2))
+    await http_clients.aclose_http_clients()
+    return first, second
+
+
+def test_clients_and_models_are_shared_within_a_loop():
+    (client, llm), (same_client, same_llm) = asyncio.run(_clients_and_llms())
+
+    assert client is same_client
+    assert llm is same_llm
+    assert client.is_closed
+
+
+def test_each_loop_gets_its_own_client_and_model():
+    (first_client, first_llm), _ = asyncio.run(_clients_and_llms())
+    (second_client, second_llm), _ = asyncio.run(_clients_and_llms())
+
+    assert first_client is not second_client
+    assert first_llm is not second_llm
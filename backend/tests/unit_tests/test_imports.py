@@ -0,0 +1,19 @@
+import importlib
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module_name",
+    ["agent", "agent.graph", "agent.simple_graph", "agent.app"],
+)
+def test_module_imports(module_name):
+    importlib.import_module(module_name)
+
+
+def test_graphs_compile():
+    from agent.graph import graph
+    from agent.simple_graph import graph as simple_graph
+
+    assert "batch_web_search" in graph.nodes
+    assert "research_agent" in simple_graph.nodes
@@ -0,0 +1,26 @@
+import asyncio
+
+from langchain_core.caches import InMemoryCache
+from langchain_core.language_models import FakeListChatModel
+
+from agent.llm_cache import stream_text
+
+
+async def _collect(llm, prompt, use_cache):
+    return "".join([text async for text in stream_text(llm, prompt, use_cache)])
+
+
+def test_stream_text_reuses_cached_completion():
+    llm = FakeListChatModel(responses=["first answer", "second answer"], cache=InMemoryCache())
+
+    first = asyncio.run(_collect(llm, "same prompt", use_cache=True))
+    second = asyncio.run(_collect(llm, "same prompt", use_cache=True))
+
+    assert first == second == "first answer"
+
+
+def test_stream_text_streams_without_cache():
+    llm = FakeListChatModel(responses=["first answer", "second answer"])
+
+    assert asyncio.run(_collect(llm, "same prompt", use_cache=False)) == "first answer"
+    assert asyncio.run(_collect(llm, "same prompt", use_cache=False)) == "second answer"
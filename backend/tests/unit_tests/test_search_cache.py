@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from agent import search_cache
+from agent.search_cache import SearchCache
+
+
+def test_concurrent_misses_share_one_fetch():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "results"
+
+    async def fetch_concurrently():
+        cache = SearchCache()
+        return await asyncio.gather(*(cache.get_or_fetch("q", 60, fetch) for _ in range(3)))
+
+    results = asyncio.run(fetch_concurrently())
+
+    assert calls == 1
+    assert sorted(results) == [("results", False), ("results", True), ("results", True)]
+
+
+def test_cached_value_is_served_without_fetch():
+    cache = SearchCache()
+
+    async def fetch():
+        return "results"
+
+    async def fetch_twice():
+        return await cache.get_or_fetch("q", 60, fetch), await cache.get_or_fetch("q", 60, fetch)
+
+    assert asyncio.run(fetch_twice()) == (("results", False), ("results", True))
+
+
+def test_errors_and_uncacheable_values_are_not_cached():
+    cache = SearchCache()
+    responses = iter([RuntimeError("search failed"), "", "results"])
+
+    async def fetch():
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def fetch_three_times():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_fetch("q", 60, fetch, cacheable=bool)
+        empty = await cache.get_or_fetch("q", 60, fetch, cacheable=bool)
+        return empty, await cache.get_or_fetch("q", 60, fetch, cacheable=bool)
+
+    assert asyncio.run(fetch_three_times()) == (("", False), ("results", False))
+    assert len(cache) == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now)
+    cache = SearchCache()
+    cache.set("q", "results")
+
+    now += 59
+    assert cache.get("q", 60) == "results"
+
+    now += 2
+    assert cache.get("q", 60) is None
+    assert len(cache) == 0
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = SearchCache()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return "results"
+
+    async def fetch_twice():
+        await cache.get_or_fetch("q", 0, fetch)
+        await cache.get_or_fetch("q", 0, fetch)
+
+    asyncio.run(fetch_twice())
+
+    assert calls == 2
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a", 60)
+    cache.set("c", 3)
+
+    assert cache.get("b", 60) is None
+    assert cache.get("a", 60) == 1
@@ -0,0 +1,32 @@
+from agent.graph import _dedupe_queries, _parse_search_queries
+
+
+def test_parse_search_queries_strips_numbering_quotes_and_suffixes():
+    text = (
+        "# Queries\n"
+        "Search query list:\n"
+        '1. "AI chips 2024 latest"\n'
+        "2) 'GPU market report'\n"
+        "\n"
+        "  3. DeepSeek V3 2025\n"
+    )
+
+    assert _parse_search_queries(text, "AI chips") == ["AI chips", "GPU market", "DeepSeek V3"]
+
+
+def test_parse_search_queries_keeps_year_from_topic():
+    assert _parse_search_queries("1. AI chips 2024\n", "AI chips 2024") == ["AI chips 2024"]
+
+
+def test_parse_search_queries_skips_lines_left_empty():
+    text = '""\n   \n1.\n2)\n3. \'\'\n4. TPU\n'
+
+    assert _parse_search_queries(text, "AI chips") == ["TPU"]
+
+
+def test_dedupe_queries_keeps_first_spelling():
+    assert _dedupe_queries(["AI  Chips", "ai chips", "GPU"]) == ["AI  Chips", "GPU"]
+
+
+def test_dedupe_queries_drops_empty_and_excluded_queries():
+    assert _dedupe_queries(["", "  ", "GPU market", "TPU"], exclude=["gpu  MARKET"]) == ["TPU"]
@@ -0,0 +1,23 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from agent import simple_graph
+
+
+def test_sub_query_errors_are_reported_as_a_message(monkeypatch):
+    def failing_llm(use_cache=False):
+        raise ValueError("DEEPSEEK_API_KEY is not set")
+
+    monkeypatch.setattr(simple_graph, "_get_llm", failing_llm)
+
+    result = asyncio.run(
+        simple_graph.research_agent(
+            {"messages": [HumanMessage(content="topic")], "sub_queries": ["a", "b"]},
+            {"configurable": {}},
+        )
+    )
+
+    assert result["messages"][0].content == "Error occurred during search: DEEPSEEK_API_KEY is not set"
+    assert result["sources_gathered"] == []
+    assert result["cache_hit"] is False
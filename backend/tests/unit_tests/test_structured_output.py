@@ -0,0 +1,97 @@
+import asyncio
+import importlib
+
+import httpx
+import openai
+import pytest
+from langchain_core.exceptions import OutputParserException
+
+from agent.tools_and_schemas import SearchQueryList
+
+graph_module = importlib.import_module("agent.graph")
+
+
+class _FakeStructuredLLM:
+    """Chat model stand-in whose structured output call raises or returns `outcome`."""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+
+    def with_structured_output(self, schema):
+        return self
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def _status_error(error_type, status_code, message):
+    request = httpx.Request("POST", "https://api.deepseek.com/chat/completions")
+    return error_type(message, response=httpx.Response(status_code, request=request), body=None)
+
+
+@pytest.fixture(autouse=True)
+def _reset_support(monkeypatch):
+    monkeypatch.setattr(graph_module, "_STRUCTURED_OK", {})
+    monkeypatch.setattr(graph_module, "_FORCE_TEXT_PARSE", False)
+
+
+def _invoke_twice(llm):
+    async def invoke():
+        return [
+            await graph_module._invoke_structured(llm, "deepseek-chat", SearchQueryList, "prompt")
+            for _ in range(2)
+        ]
+
+    return asyncio.run(invoke())
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        _status_error(openai.BadRequestError, 400, "response_format type is unavailable"),
+        _status_error(openai.UnprocessableEntityError, 422, "tools are not supported"),
+    ],
+)
+def test_rejected_structured_output_is_remembered(error):
+    llm = _FakeStructuredLLM(error)
+
+    assert _invoke_twice(llm) == [None, None]
+    assert llm.calls == 1
+    assert graph_module._STRUCTURED_OK == {"deepseek-chat": False}
+
+
+def test_missing_structure_is_remembered():
+    llm = _FakeStructuredLLM(None)
+
+    assert _invoke_twice(llm) == [None, None]
+    assert llm.calls == 1
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        _status_error(openai.BadRequestError, 400, "maximum context length is 65536 tokens"),
+        _status_error(openai.AuthenticationError, 401, "invalid api key"),
+        _status_error(openai.PermissionDeniedError, 403, "access denied"),
+        _status_error(openai.RateLimitError, 429, "rate limit reached"),
+        OutputParserException("invalid json"),
+    ],
+)
+def test_other_errors_leave_support_unrecorded(error):
+    llm = _FakeStructuredLLM(error)
+
+    assert _invoke_twice(llm) == [None, None]
+    assert llm.calls == 2
+    assert graph_module._STRUCTURED_OK == {}
+
+
+def test_successful_structured_output_is_returned():
+    queries = SearchQueryList(query=["AI chips"], rationale="Covers the topic")
+    llm = _FakeStructuredLLM(queries)
+
+    assert _invoke_twice(llm) == [queries, queries]
+    assert graph_module._STRUCTURED_OK == {"deepseek-chat": True}
@@ -0,0 +1,88 @@
+import random
+
+from agent.tavily_processor import (
+    process_citations_in_response,
+    process_search_results_for_ai,
+    validate_and_clean_content,
+)
+
+
+def test_cleaning_drops_invisible_characters_but_keeps_joiners():
+    content = "Zero\u200bwidth\u00ad text\ufeff. \u0645\u06cc\u200c\u062e\u0648\u0627\u0647\u0645 \U0001F469\u200d\U0001F4BB"
+
+    assert validate_and_clean_content(content) == (
+        "Zerowidth text. \u0645\u06cc\u200c\u062e\u0648\u0627\u0647\u0645 \U0001F469\u200d\U0001F4BB"
+    )
+
+
+def _clean_then_truncate(content, max_length):
+    cleaned = validate_and_clean_content(content)
+    if len(cleaned) > max_length:
+        cleaned = cleaned[:max_length] + "..."
+    return cleaned
+
+
+def _processed_content(content, max_length):
+    _, sources = process_search_results_for_ai(
+        {"results": [{"title": "Page", "url": "https://example.com/page", "content": content}]},
+        max_content_length=max_length,
+        min_content_length=1,
+    )
+    return sources[0].content if sources else ""
+
+
+def test_noisy_page_matches_clean_then_truncate():
+    # One ad block, removed up to its closing period, spans far more than the cleaning window
+    noise = "Advertisement " + "sponsored banner content " * 200
+    content = noise + ". The actual article text starts here." * 50
+
+    expected = _clean_then_truncate(content, 100)
+
+    assert expected.startswith(". The actual article text")
+    assert expected.endswith("...")
+    assert _processed_content(content, 100) == expected
+
+
+def test_random_pages_match_clean_then_truncate():
+    rng = random.Random(0)
+    pieces = ["word ", "Cookie notice ", "Ad ", "JavaScript ", "Enable JavaScript ", ". ", "​", "  \n"]
+    for _ in range(300):
+        content = "x" + "".join(rng.choice(pieces) for _ in range(rng.randint(0, 400)))
+        max_length = rng.randint(5, 60)
+        assert _processed_content(content, max_length) == _clean_then_truncate(content, max_length)
+
+
+def _sources():
+    _, sources = process_search_results_for_ai({"results": [
+        {"title": "A very long descriptive article title", "url": "https://example.com/a", "content": "Content long enough to keep."},
+        {"title": "Short", "url": "https://other.org/b", "content": "More content long enough to keep."},
+    ]})
+    return sources
+
+
+def test_process_citations_replaces_urls_and_domains():
+    response = "See https://example.com/a and other.org for details."
+
+    assert process_citations_in_response(response, _sources()) == "See [1] and [2] for details."
+
+
+def test_process_citations_cites_long_titles_without_nearby_citation():
+    response = (
+        "Background first, with enough words to keep the citation away. "
+        "A very long descriptive article title says so. Short says otherwise."
+    )
+
+    assert process_citations_in_response(response, _sources()) == (
+        "Background first, with enough words to keep the citation away. "
+        "A very long descriptive article title[1] says so. Short says otherwise."
+    )
+
+
+def test_process_citations_keeps_already_cited_titles():
+    response = "A very long descriptive article title [1] says so."
+
+    assert process_citations_in_response(response, _sources()) == response
+
+
+def test_process_citations_without_sources_returns_response():
+    assert process_citations_in_response("See example.com.", []) == "See example.com."
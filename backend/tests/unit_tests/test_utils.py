@@ -0,0 +1,35 @@
+from agent.utils import CitationRewriter
+
+SOURCES = [
+    {"short_url": "[s1]", "title": "First", "url": "https://a.example"},
+    {"short_url": "[s12]", "title": "Twelfth", "url": "https://b.example"},
+    {"short_url": "[s1]", "title": "First duplicate", "url": "https://c.example"},
+]
+TEXT = "Chips [s12] are fast [s1]. Again [s12][s1], unknown [s3], end [s1"
+
+
+def _rewrite(chunks, sources=SOURCES):
+    rewriter = CitationRewriter(sources)
+    text = "".join(rewriter.feed(chunk) for chunk in chunks) + rewriter.flush()
+    return text, rewriter.cited_sources
+
+
+def test_one_shot_rewrite_numbers_citations_by_first_appearance():
+    text, cited_sources = _rewrite([TEXT])
+
+    assert text == "Chips [1] are fast [2]. Again [1][2], unknown [s3], end [s1"
+    assert [source["title"] for source in cited_sources] == ["Twelfth", "First"]
+
+
+def test_chunked_rewrite_matches_one_shot_rewrite():
+    expected = _rewrite([TEXT])
+
+    for size in range(1, 8):
+        chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+        assert _rewrite(chunks) == expected
+    for split in range(len(TEXT) + 1):
+        assert _rewrite([TEXT[:split], TEXT[split:]]) == expected
+
+
+def test_rewrite_without_sources_passes_text_through():
+    assert _rewrite(["Chips ", "[s1]"], sources=[]) == ("Chips [s1]", [])
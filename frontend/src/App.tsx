@@ -70,8 +70,8 @@ export default function App() {
           title: "Generate Search Query",
           data: event.generate_query?.search_query?.join(", ") || "",
         };
-      } else if (event.web_research) {
-        const sources = event.web_research.sources_gathered || [];
+      } else if (event.batch_web_search) {
+        const sources = event.batch_web_search.sources_gathered || [];
         const numSources = sources.length;
         const uniqueLabels = [
           ...new Set(sources.map((s: any) => s.label).filter(Boolean)),